@@ -0,0 +1,84 @@
+#-*- coding:utf8 -*-
+
+'''
+Scaling of encode_many/decode_many across processes.
+
+Usage:
+    python benchmarks/bench_batch.py [--count N] [--processes 1,2,4]
+'''
+
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyhessian2 import HessianObject, encode_many, decode_many
+
+
+def small_message(i):
+    return HessianObject('com.example.Order', {
+        'id': i,
+        'user': 'user-%d' % i,
+        'amount': i * 100,
+        'paid': i % 2 == 0,
+    })
+
+
+def large_message(i):
+    return HessianObject('com.example.Report', {
+        'id': i,
+        'title': 'report %d ' % i * 8,
+        'rows': [small_message(i * 1000 + j) for j in xrange(200)],
+    })
+
+
+def measure(func, items, processes, pool):
+    begin = time.time()
+    func(items, processes=processes, pool=pool)
+    return time.time() - begin
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--processes', default=None,
+                        help='comma separated process counts')
+    args = parser.parse_args()
+
+    if args.processes:
+        counts = [int(i) for i in args.processes.split(',')]
+    else:
+        counts = sorted(set([1, 2, 4, cpu_count()]))
+
+    cases = [
+        ('small', [small_message(i) for i in xrange(args.count)]),
+        ('large', [large_message(i) for i in xrange(args.count // 100)]),
+    ]
+
+    print('%-6s %-7s %9s %12s %12s' % (
+        'case', 'op', 'processes', 'msgs/s', 'speedup'))
+    for name, vals in cases:
+        bufs = encode_many(vals)
+        for op, func, items in (('encode', encode_many, vals),
+                                ('decode', decode_many, bufs)):
+            serial = None
+            for processes in counts:
+                pool = Pool(processes) if processes > 1 else None
+                try:
+                    elapsed = measure(func, items, processes, pool)
+                finally:
+                    if pool is not None:
+                        pool.close()
+                        pool.join()
+                if serial is None:
+                    serial = elapsed
+                print('%-6s %-7s %9d %12.0f %11.2fx' % (
+                    name, op, processes, len(items) / elapsed,
+                    serial / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#-*- coding:utf8 -*-
+
+'''
+Compression ratio against cpu cost of CompressedCodec on the corpus.
+
+For every corpus case, compares plain deflate with a dictionary built from
+the class definitions and one trained on other samples of the same case.
+
+Usage:
+    python benchmarks/bench_compress.py [--train 50]
+'''
+
+import argparse
+import os
+import sys
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyhessian2 import dumps
+from pyhessian2.compress import (
+    CompressedCodec, DictionaryRegistry, dictionary_from_classes,
+    train_dictionary)
+import corpus
+
+
+CLASSES = [
+    ('com.example.rpc.OrderDTO', [
+        'id', 'userId', 'status', 'amount', 'paid', 'createdAt', 'remark',
+        'tags']),
+    ('com.example.tree.Node', ['name', 'weight', 'children']),
+]
+
+
+def per_call(func, arg, min_time=0.2):
+    count = 0
+    begin = default_timer()
+    while True:
+        func(arg)
+        count += 1
+        elapsed = default_timer() - begin
+        if elapsed >= min_time:
+            return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--train', type=int, default=50,
+                        help='samples to train each dictionary on')
+    args = parser.parse_args()
+
+    print('%-14s %-8s %9s %9s %7s %12s %12s' % (
+        'case', 'dict', 'raw', 'framed', 'ratio', 'compress us',
+        'decomp us'))
+    for name, _ in corpus.CASES:
+        data = dumps(corpus.build(name))
+        samples = [dumps(corpus.build(name, seed))
+                   for seed in xrange(args.train)]
+        registry = DictionaryRegistry()
+        registry.register(1, dictionary_from_classes(
+            CLASSES, strings=corpus.WORDS))
+        registry.register(2, train_dictionary(samples))
+        for label, dict_id in (('none', 0), ('classes', 1), ('trained', 2)):
+            codec = CompressedCodec(registry, dict_id, threshold=0)
+            frame = codec.compress(data)
+            assert codec.decompress(frame) == data
+            print('%-14s %-8s %9d %9d %7.3f %12.1f %12.1f' % (
+                name, label, len(data), len(frame),
+                float(len(frame)) / len(data),
+                per_call(codec.compress, data) * 1e6,
+                per_call(codec.decompress, frame) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
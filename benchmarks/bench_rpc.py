@@ -0,0 +1,89 @@
+#-*- coding:utf8 -*-
+
+'''
+Latency and throughput of HessianClient against the local stand-in server.
+
+Usage:
+    python benchmarks/bench_rpc.py [--calls N] [--threads 1,4,16]
+'''
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyhessian2 import HessianObject
+from pyhessian2.rpc import HessianClient, ConnectionPool
+from tests.hessian_server import HessianServer
+
+
+def percentile(sorted_vals, p):
+    index = int(round(p / 100.0 * (len(sorted_vals) - 1)))
+    return sorted_vals[index]
+
+
+def latency(client, arg, calls):
+    samples = []
+    for i in xrange(calls):
+        begin = time.time()
+        client.echo(arg)
+        samples.append(time.time() - begin)
+    samples.sort()
+    return [percentile(samples, p) * 1000 for p in (50, 90, 99)]
+
+
+def throughput(client, arg, calls, threads):
+    per_thread = calls // threads
+
+    def run():
+        for i in xrange(per_thread):
+            client.echo(arg)
+
+    workers = [threading.Thread(target=run) for i in xrange(threads)]
+    begin = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads / (time.time() - begin)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--threads', default='1,4,16')
+    args = parser.parse_args()
+
+    server = HessianServer(('127.0.0.1', 0))
+    server.start()
+    host, port = server.server_address
+
+    arg = HessianObject('com.example.Order', {
+        'id': 1, 'user': 'someone', 'amount': 1000, 'paid': True})
+
+    print('%-22s %9s %9s %9s' % ('latency (ms)', 'p50', 'p90', 'p99'))
+    for name, maxsize in (('pooled', 1), ('no keep-alive', 1)):
+        pool = ConnectionPool('http', host, port, maxsize)
+        client = HessianClient(server.url, pool=pool)
+        if name == 'no keep-alive':
+            client.headers['Connection'] = 'close'
+        print('%-22s %9.3f %9.3f %9.3f' % (
+            (name,) + tuple(latency(client, arg, args.calls))))
+        pool.close()
+
+    print('')
+    print('%-22s %9s' % ('threads', 'calls/s'))
+    for threads in [int(i) for i in args.threads.split(',')]:
+        pool = ConnectionPool('http', host, port, threads)
+        client = HessianClient(server.url, pool=pool)
+        print('%-22d %9.0f' % (
+            threads, throughput(client, arg, args.calls, threads)))
+        pool.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
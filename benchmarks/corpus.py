@@ -0,0 +1,100 @@
+#-*- coding:utf8 -*-
+
+'''
+Generated payload corpus for the benchmarks.
+
+Every payload is built from a seeded random generator, so the corpus is the
+same on every run and every machine. Only values the decoder can read back
+are used: python floats and binary data are encoded with codes the decoder
+doesn't implement yet, so doubles are DoubleType and binary blobs are
+base64 text.
+'''
+
+import base64
+import random
+from datetime import datetime
+from pyhessian2.proto import HessianObject, DoubleType
+
+
+SEED = 20161019
+
+WORDS = [
+    'alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel',
+    'india', 'juliet', 'kilo', 'lima', 'mike', 'november', 'oscar', 'papa',
+    u'北京', u'上海', u'深圳', u'杭州',
+]
+
+
+def _text(rnd, words):
+    return u' '.join(rnd.choice(WORDS) for i in xrange(words))
+
+
+def _dto(rnd):
+    return HessianObject('com.example.rpc.OrderDTO', {
+        'id': rnd.randint(0, 2**31 - 1),
+        'userId': long(rnd.randint(0, 2**40)),
+        'status': rnd.choice(['NEW', 'PAID', 'SHIPPED', 'CLOSED']),
+        'amount': DoubleType(rnd.randint(0, 10**6) / 100.0),
+        'paid': rnd.random() < 0.5,
+        'createdAt': datetime(2016, 1, 1, rnd.randint(0, 23),
+                              rnd.randint(0, 59)),
+        'remark': _text(rnd, rnd.randint(0, 8)),
+        'tags': [rnd.choice(WORDS) for j in xrange(rnd.randint(0, 4))],
+    })
+
+
+def rpc_dto(rnd):
+    return _dto(rnd)
+
+
+def object_list(rnd):
+    return [_dto(rnd) for i in xrange(1000)]
+
+
+def deep_tree(rnd, depth=10):
+    children = []
+    if depth:
+        children = [deep_tree(rnd, depth - 1) for i in xrange(2)]
+    return HessianObject('com.example.tree.Node', {
+        'name': rnd.choice(WORDS),
+        'weight': rnd.randint(-1000, 1000),
+        'children': children,
+    })
+
+
+def text_map(rnd):
+    return dict(
+        ('key.%d' % i, _text(rnd, rnd.randint(1, 300)))
+        for i in xrange(200))
+
+
+def numeric_array(rnd):
+    ints = [rnd.randint(-2**31, 2**31 - 1) for i in xrange(3000)]
+    longs = [long(rnd.randint(-2**62, 2**62)) for i in xrange(1000)]
+    doubles = [DoubleType(rnd.uniform(-1e6, 1e6)) for i in xrange(1000)]
+    return [ints, longs, doubles]
+
+
+def binary_blob(rnd):
+    # encode_string splits strings longer than 0xffff characters wrongly,
+    # stay below
+    raw = ''.join(chr(rnd.randint(0, 255)) for i in xrange(45000))
+    return base64.b64encode(raw)
+
+
+CASES = [
+    ('rpc_dto', rpc_dto),
+    ('object_list', object_list),
+    ('deep_tree', deep_tree),
+    ('text_map', text_map),
+    ('numeric_array', numeric_array),
+    ('binary_blob', binary_blob),
+]
+
+
+def build(name, seed=SEED):
+    return dict(CASES)[name](random.Random('%s-%s' % (seed, name)))
+
+
+def build_all():
+    return [(name, build(name)) for name, _ in CASES]
@@ -0,0 +1,196 @@
+#-*- coding:utf8 -*-
+
+'''
+Encode/decode benchmark over the generated corpus, with a regression gate.
+
+Usage:
+    python benchmarks/run.py                          # print results
+    python benchmarks/run.py --save baseline.json     # record a baseline
+    python benchmarks/run.py --compare baseline.json --threshold 10
+
+With --compare the exit status is 1 when a gated metric of any case is
+more than threshold percent worse than in the baseline.
+'''
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+from multiprocessing import Process, Queue
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyhessian2 import Encoder, Decoder
+import corpus
+
+
+# metric -> True if higher is better
+GATED_METRICS = {
+    'ops_per_sec': True,
+    'peak_kb': False,
+}
+
+# changes smaller than this are noise whatever the percentage, resident
+# size moves by whole pages and allocator arenas
+NOISE_FLOOR = {
+    'peak_kb': 1024,
+}
+
+
+def percentile(sorted_vals, p):
+    index = int(round(p / 100.0 * (len(sorted_vals) - 1)))
+    return sorted_vals[index]
+
+
+def encode_once(val):
+    return Encoder().encode(val)
+
+
+def decode_once(buf):
+    return Decoder().decode(buf)
+
+
+def timed_loop(func, arg, min_time, warmup=3):
+    for i in xrange(warmup):
+        func(arg)
+    samples = []
+    total = 0.0
+    while total < min_time or len(samples) < 5:
+        begin = default_timer()
+        func(arg)
+        elapsed = default_timer() - begin
+        samples.append(elapsed)
+        total += elapsed
+    return samples
+
+
+def _peak_child(func, arg, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    func(arg)
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(after - before)
+
+
+def peak_memory(func, arg):
+    '''
+    Growth of the peak resident size (KB on linux) while running func once
+    in a fresh child process.
+    '''
+    queue = Queue()
+    child = Process(target=_peak_child, args=(func, arg, queue))
+    child.start()
+    ret = queue.get()
+    child.join()
+    return ret
+
+
+def measure(func, arg, size, min_time):
+    samples = timed_loop(func, arg, min_time)
+    total = sum(samples)
+    samples.sort()
+    return {
+        'ops_per_sec': len(samples) / total,
+        'mb_per_sec': size * len(samples) / total / 2**20,
+        'p50_us': percentile(samples, 50) * 1e6,
+        'p90_us': percentile(samples, 90) * 1e6,
+        'p99_us': percentile(samples, 99) * 1e6,
+        'peak_kb': peak_memory(func, arg),
+    }
+
+
+def run(names, min_time):
+    results = {}
+    for name in names:
+        val = corpus.build(name)
+        buf = encode_once(val)
+        results[name] = {
+            'size': len(buf),
+            'encode': measure(encode_once, val, len(buf), min_time),
+            'decode': measure(decode_once, buf, len(buf), min_time),
+        }
+    return results
+
+
+def report(results):
+    print('%-14s %-6s %9s %10s %9s %10s %10s %10s %9s' % (
+        'case', 'op', 'size', 'ops/s', 'MB/s', 'p50 us', 'p90 us',
+        'p99 us', 'peak KB'))
+    for name in sorted(results):
+        case = results[name]
+        for op in ('encode', 'decode'):
+            r = case[op]
+            print('%-14s %-6s %9d %10.1f %9.2f %10.1f %10.1f %10.1f %9d' % (
+                name, op, case['size'], r['ops_per_sec'], r['mb_per_sec'],
+                r['p50_us'], r['p90_us'], r['p99_us'], r['peak_kb']))
+
+
+def compare(results, baseline, threshold):
+    '''
+    Return the list of regressions beyond threshold percent.
+    '''
+    regressions = []
+    for name, case in sorted(results.iteritems()):
+        if name not in baseline:
+            continue
+        for op in ('encode', 'decode'):
+            for metric, higher_is_better in sorted(GATED_METRICS.items()):
+                old = baseline[name][op][metric]
+                new = case[op][metric]
+                if not old:
+                    continue
+                if abs(new - old) < NOISE_FLOOR.get(metric, 0):
+                    continue
+                change = (new - old) * 100.0 / old
+                if higher_is_better:
+                    change = -change
+                if change > threshold:
+                    regressions.append(
+                        '%s %s %s: %.1f -> %.1f (%.1f%% worse)' % (
+                            name, op, metric, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--case', action='append', dest='cases',
+                        choices=[name for name, _ in corpus.CASES],
+                        help='case to run, may repeat, default all')
+    parser.add_argument('--min-time', type=float, default=1.0,
+                        help='seconds spent on each case and operation')
+    parser.add_argument('--save', help='write results to this json file')
+    parser.add_argument('--compare', help='baseline json file to check')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='allowed regression in percent')
+    args = parser.parse_args()
+
+    names = args.cases or [name for name, _ in corpus.CASES]
+    results = run(names, args.min_time)
+    report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cases': results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['cases']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('')
+            print('regressions over %.1f%%:' % args.threshold)
+            for line in regressions:
+                print('  ' + line)
+            sys.exit(1)
+        print('')
+        print('no regression over %.1f%%' % args.threshold)
+
+
+if __name__ == '__main__':
+    main()
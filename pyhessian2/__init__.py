@@ -2,3 +2,5 @@
 from .decoder import Decoder
 from .encoder import Encoder
 from .proto import HessianObject
+from .batch import encode_many, decode_many
+from .pool import dumps, loads
@@ -0,0 +1,124 @@
+#-*- coding:utf8 -*-
+
+'''
+Batch encoding and decoding of independent hessian messages.
+
+A batch is either handled serially by one pooled codec that is reset
+between messages, or spread over a process pool in chunks. Results are
+always returned in the order of the input.
+'''
+
+from multiprocessing import Pool, cpu_count
+from .decoder import Decoder
+from .encoder import Encoder
+from .pool import decoder_pool, encoder_pool
+
+
+# codecs of a pool worker process, which runs one chunk at a time; never
+# used by the serial path, which may run in several threads at once
+_encoder = None
+_decoder = None
+
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None:
+        _encoder = Encoder()
+    return _encoder
+
+
+def _get_decoder():
+    global _decoder
+    if _decoder is None:
+        _decoder = Decoder()
+    return _decoder
+
+
+def _encode(encoder, val):
+    encoder.reset()
+    try:
+        return True, encoder.encode(val)
+    except Exception as e:
+        return False, e
+
+
+def _decode(decoder, buf):
+    decoder.reset()
+    try:
+        return True, decoder.decode(buf)
+    except Exception as e:
+        return False, e
+
+
+def _encode_one(val):
+    return _encode(_get_encoder(), val)
+
+
+def _decode_one(buf):
+    return _decode(_get_decoder(), buf)
+
+
+def _chunksize(length, processes):
+    # about four chunks per worker, like concurrent.futures does
+    chunksize, extra = divmod(length, processes * 4)
+    if extra:
+        chunksize += 1
+    return max(chunksize, 1)
+
+
+def _run(func, worker_func, codecs, items, processes, pool, chunksize,
+         return_exceptions):
+    items = list(items)
+    if pool is None and processes == 1:
+        with codecs.codec() as codec:
+            results = [func(codec, item) for item in items]
+    else:
+        own_pool = pool is None
+        if own_pool:
+            processes = processes or cpu_count()
+            pool = Pool(processes)
+        else:
+            processes = processes or cpu_count()
+        try:
+            if chunksize is None:
+                chunksize = _chunksize(len(items), processes)
+            results = pool.map(worker_func, items, chunksize)
+        finally:
+            if own_pool:
+                pool.close()
+                pool.join()
+
+    ret = []
+    for ok, val in results:
+        if not ok and not return_exceptions:
+            raise val
+        ret.append(val)
+    return ret
+
+
+def encode_many(vals, processes=1, pool=None, chunksize=None,
+                return_exceptions=False):
+    '''
+    Encode every value of vals as an independent message.
+
+    processes=1 encodes serially in this process, processes=None uses one
+    worker per cpu. An existing multiprocessing.Pool may be passed as pool
+    to avoid paying the pool start-up on every batch.
+
+    If return_exceptions is true, a value that fails to encode gets its
+    exception in its place of the result list, otherwise the first failure
+    is raised.
+    '''
+    return _run(_encode, _encode_one, encoder_pool, vals, processes, pool,
+                chunksize, return_exceptions)
+
+
+def decode_many(bufs, processes=1, pool=None, chunksize=None,
+                return_exceptions=False):
+    '''
+    Decode every buffer of bufs as an independent message.
+
+    Arguments have the same meaning as in encode_many.
+    '''
+    return _run(_decode, _decode_one, decoder_pool, bufs, processes, pool,
+                chunksize, return_exceptions)
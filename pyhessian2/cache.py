@@ -0,0 +1,377 @@
+#-*- coding:utf8 -*-
+
+'''
+Content addressed cache of decoded messages and subtrees.
+
+Entries are keyed by the encoded bytes themselves: a python string caches
+its hash once computed, and a hit is confirmed by comparing the bytes, so
+two different messages never share an entry. Eviction is least recently
+used, bounded by the number of entries and by their total encoded size.
+
+Cached values are handed out as copies, so a caller changing its result
+can't change what the next caller gets. copy=False skips the copy for
+callers that never modify decoded values.
+'''
+
+import copy
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from .decoder import Decoder
+from .proto import HessianObject, TypedMap, DoubleType
+
+
+_MISSING = object()
+
+IMMUTABLE_TYPES = frozenset([
+    type(None), bool, int, long, float, str, unicode, datetime])
+
+
+def _as_bytes(buf):
+    '''
+    The bytes of buf as a string, usable as a key.
+    '''
+    if isinstance(buf, str):
+        return buf
+    elif isinstance(buf, memoryview):
+        # str() of a memoryview is its repr
+        return buf.tobytes()
+    elif isinstance(buf, (bytearray, buffer)):
+        return str(buf)
+    raise Exception("Can't cache a buffer of type %s" % type(buf))
+
+
+def copy_graph(val, memo=None):
+    '''
+    Deep copy of a decoded value, keeping shared and cyclic references.
+    Faster than copy.deepcopy for the types the decoder creates.
+    '''
+    if memo is None:
+        memo = {}
+    return _copy(val, memo)
+
+
+def _copy(val, memo):
+    _type = type(val)
+    if _type in IMMUTABLE_TYPES:
+        return val
+    _id = id(val)
+    if _id in memo:
+        return memo[_id]
+    # register the copy before its items, for cycles
+    if _type is list:
+        ret = memo[_id] = []
+        for v in val:
+            ret.append(_copy(v, memo))
+    elif _type is dict:
+        ret = memo[_id] = {}
+        for k, v in val.iteritems():
+            ret[_copy(k, memo)] = _copy(v, memo)
+    elif _type is HessianObject:
+        ret = memo[_id] = HessianObject(val._class, None)
+        ret.attrs = _copy(val.attrs, memo)
+    elif _type is TypedMap:
+        ret = memo[_id] = TypedMap(val._type, None)
+        ret.val = _copy(val.val, memo)
+    elif _type is DoubleType:
+        ret = memo[_id] = DoubleType(val.value)
+    else:
+        ret = copy.deepcopy(val, memo)
+    return ret
+
+
+class DecodeCache(object):
+    '''
+    Thread safe LRU cache of decoded messages.
+
+        >>> cache = DecodeCache(max_entries=1024, max_bytes=64 << 20)
+        >>> obj = cache.decode(buf)
+    '''
+    def __init__(self, max_entries=1024, max_bytes=64 << 20, copy=True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.copy = copy
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        '''
+        Return the value stored for key, or default, and count a hit or
+        miss.
+        '''
+        with self._lock:
+            val = self._entries.pop(key, _MISSING)
+            if val is _MISSING:
+                self.misses += 1
+                return default
+            self._entries[key] = val
+            self.hits += 1
+            return val
+
+    def put(self, key, val):
+        size = len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self.bytes -= size
+            else:
+                self._added(key)
+            self._entries[key] = val
+            self.bytes += size
+            while (len(self._entries) > self.max_entries
+                   or self.bytes > self.max_bytes):
+                evicted, _ = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+                self._evicted(evicted)
+
+    # called with the lock held, as a key comes in and goes out
+    def _added(self, key):
+        pass
+
+    def _evicted(self, key):
+        pass
+
+    def clear(self):
+        with self._lock:
+            while self._entries:
+                key, _ = self._entries.popitem()
+                self._evicted(key)
+            self.bytes = 0
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+    def decode(self, buf, decoder=None):
+        '''
+        Decode a whole message, from the cache when it was seen before.
+        '''
+        buf = _as_bytes(buf)
+        val = self.get(buf, _MISSING)
+        if val is _MISSING:
+            decoder = decoder or Decoder()
+            decoder.reset()
+            val = decoder.decode(buf)
+            self.put(buf, val)
+        if self.copy:
+            return copy_graph(val)
+        return val
+
+
+class _Subtree(object):
+    def __init__(self, val, refs, ref_start, classes, class_start,
+                 class_deps, types):
+        self.val = val
+        # ref slots the subtree took, in order, the first is usually val
+        self.refs = refs
+        # position the subtree's own refs and class refs are relative to,
+        # None when they don't matter
+        self.ref_start = ref_start
+        self.class_start = class_start
+        # (class, fields) defined inside, and used from outside by index
+        self.classes = classes
+        self.class_deps = class_deps
+        self.types = types
+
+
+class SubtreeCache(DecodeCache):
+    '''
+    DecodeCache of lists, maps and objects nested in messages, indexed by
+    their first bytes so a decoder can tell where a cached one begins.
+    '''
+    PREFIX_SIZE = 32
+
+    def __init__(self, max_entries=4096, max_bytes=64 << 20):
+        super(SubtreeCache, self).__init__(max_entries, max_bytes, copy=True)
+        # prefix -> {subtree length: number of entries}
+        self._prefixes = {}
+
+    def find(self, buf, pos, accept):
+        '''
+        Return (length, entry) of a cached subtree starting at buf[pos]
+        for which accept(entry) is true, or None. Counts one hit or miss.
+        '''
+        prefix = _as_bytes(buf[pos:pos+self.PREFIX_SIZE])
+        with self._lock:
+            for length in self._prefixes.get(prefix, ()):
+                if pos + length > len(buf):
+                    continue
+                key = _as_bytes(buf[pos:pos+length])
+                entry = self._entries.get(key)
+                if entry is not None and accept(entry):
+                    self._entries[key] = self._entries.pop(key)
+                    self.hits += 1
+                    return length, entry
+            self.misses += 1
+            return None
+
+    def _added(self, key):
+        lengths = self._prefixes.setdefault(key[:self.PREFIX_SIZE], {})
+        lengths[len(key)] = lengths.get(len(key), 0) + 1
+
+    def _evicted(self, key):
+        prefix = key[:self.PREFIX_SIZE]
+        lengths = self._prefixes.get(prefix)
+        if not lengths:
+            return
+        lengths[len(key)] -= 1
+        if not lengths[len(key)]:
+            del lengths[len(key)]
+            if not lengths:
+                del self._prefixes[prefix]
+
+
+SUBTREE_TAGS = frozenset(['V', 'H', 'M', 'O', 'o'])
+
+
+class CachingDecoder(Decoder):
+    '''
+    Decoder that reuses the decoded value of nested lists, maps and objects
+    of at least min_size bytes it has decoded before, from any message.
+    min_size can't be below the prefix size of the cache.
+
+    A subtree is only cached if its bytes alone decide its value: it may
+    refer to classes defined earlier in the message, which are checked on
+    reuse, but not to earlier values or type refs.
+    '''
+    def __init__(self, cache=None, min_size=1024, stats=None):
+        self.cache = cache if cache is not None else SubtreeCache()
+        self.min_size = max(min_size, self.cache.PREFIX_SIZE)
+        self._ref_reads = []
+        self._class_reads = []
+        self._type_reads = 0
+        super(CachingDecoder, self).__init__(stats)
+
+    def reset(self):
+        super(CachingDecoder, self).reset()
+        del self._ref_reads[:]
+        del self._class_reads[:]
+        self._type_reads = 0
+
+    def _decode(self, pos, buf):
+        if buf[pos] not in SUBTREE_TAGS:
+            return super(CachingDecoder, self)._decode(pos, buf)
+        hit = self._lookup(pos, buf)
+        if hit is not None:
+            return hit
+
+        factory = self.hessian_obj_factory
+        ref_start = len(self._refs)
+        class_start = len(factory.objects)
+        type_start = len(self._type_refs)
+        ref_reads = len(self._ref_reads)
+        class_reads = len(self._class_reads)
+        type_reads = self._type_reads
+
+        end, val = super(CachingDecoder, self)._decode(pos, buf)
+
+        if end - pos < self.min_size or self._type_reads != type_reads:
+            return end, val
+        refs_read = self._ref_reads[ref_reads:]
+        if refs_read and min(refs_read) < ref_start:
+            return end, val
+
+        class_deps = {}
+        inner_class_refs = False
+        for ref in self._class_reads[class_reads:]:
+            if ref < class_start:
+                _class = factory.objects[ref]
+                class_deps[ref] = (_class, factory.object_fields[_class])
+            else:
+                inner_class_refs = True
+        classes = [(_class, factory.object_fields[_class])
+                   for _class in factory.objects[class_start:]]
+
+        memo = {}
+        entry = _Subtree(
+            copy_graph(val, memo),
+            [copy_graph(ref, memo) for ref in self._refs[ref_start:]],
+            ref_start if refs_read else None,
+            classes,
+            class_start if inner_class_refs else None,
+            class_deps,
+            self._type_refs[type_start:])
+        self.cache.put(_as_bytes(buf[pos:end]), entry)
+        return end, val
+
+    def _lookup(self, pos, buf):
+        found = self.cache.find(buf, pos, self._applies)
+        if found is None:
+            return None
+        length, entry = found
+        return pos + length, self._replay(entry)
+
+    def _applies(self, entry):
+        factory = self.hessian_obj_factory
+        if (entry.ref_start is not None
+                and entry.ref_start != len(self._refs)):
+            return False
+        if (entry.class_start is not None
+                and entry.class_start != len(factory.objects)):
+            return False
+        for ref, (_class, fields) in entry.class_deps.iteritems():
+            if ref >= len(factory.objects):
+                return False
+            if factory.objects[ref] != _class:
+                return False
+            if factory.object_fields[_class] != fields:
+                return False
+        return True
+
+    def _replay(self, entry):
+        memo = {}
+        val = copy_graph(entry.val, memo)
+        for ref in entry.refs:
+            self._refs.append(copy_graph(ref, memo))
+        for _class, fields in entry.classes:
+            self.hessian_obj_factory.create_object(_class, list(fields))
+        self._type_refs.extend(entry.types)
+        # a subtree around this one depends on what this one depends on
+        if entry.ref_start is not None:
+            self._ref_reads.append(entry.ref_start)
+        if entry.class_start is not None:
+            self._class_reads.append(entry.class_start)
+        self._class_reads.extend(entry.class_deps)
+        return val
+
+    def read_ref_id(self, pos, buf):
+        pos, ref = super(CachingDecoder, self).read_ref_id(pos, buf)
+        self._ref_reads.append(ref)
+        return pos, ref
+
+    def decode_object_instance(self, pos, buf):
+        ref = 0
+        if self.is_int(buf[pos+1]):
+            ref = self.decode_int(pos+1, buf)[1]
+        self._class_reads.append(ref)
+        return super(CachingDecoder, self).decode_object_instance(pos, buf)
+
+    def decode_list(self, pos, buf):
+        if buf[pos+1] == 'u':
+            self._type_reads += 1
+        return super(CachingDecoder, self).decode_list(pos, buf)
+
+    def decode_list_ref(self, pos, buf):
+        self._type_reads += 1
+        return super(CachingDecoder, self).decode_list_ref(pos, buf)
+
+    def decode_typed_map(self, pos, buf):
+        if buf[pos+1] == 'u':
+            self._type_reads += 1
+        return super(CachingDecoder, self).decode_typed_map(pos, buf)
@@ -0,0 +1,211 @@
+#-*- coding:utf8 -*-
+
+'''
+Compressed framing of hessian messages with preset dictionaries.
+
+Frame:
+    'Z' flags(1) dict_id(2) length(4) crc32(4) body
+
+    length is that of the message, crc32 that of the rest of the frame, so
+    a frame cut short or corrupted is rejected; raw deflate has no check of
+    its own.
+
+    flags 0: body is the message as is
+    flags 1: body is the message as raw deflate data, compressed after the
+             dictionary dict_id (0 is the empty dictionary)
+
+Class names, field names and type strings repeat in every message but
+can't be learnt from a single small one, a dictionary holding them lets
+deflate refer to them from the first byte. Dictionaries are built from
+class definitions with dictionary_from_classes, or learnt from sample
+messages with train_dictionary, and registered under an id; a new version
+of a dictionary gets a new id, so frames made with the old one can still be
+read.
+
+zlib of python 2 has no preset dictionary argument. Instead the dictionary
+is fed to a raw deflate stream, flushed to a byte boundary, and that state
+is copied for every message. The body can refer back into the dictionary
+like a zlib preset dictionary stream would, but it isn't the same bytes:
+only a decompressor primed the same way can read it.
+
+A frame expanding to more than max_size bytes is rejected while it is
+being decompressed, so a small hostile frame can't exhaust memory.
+'''
+
+import zlib
+from collections import defaultdict
+from struct import pack, unpack_from
+from .encoder import Encoder
+from .proto import HessianObject
+from .pool import dumps, loads
+
+
+MAGIC = 'Z'
+# the crc32 follows, and covers everything in the frame but itself
+HEADER = '>cBHL'
+CRC_OFFSET = 8
+HEADER_SIZE = 12
+RAW = 0
+DEFLATE = 1
+# deflate can't look further back than its 32KB window
+MAX_DICT_SIZE = 32 * 1024
+DEFAULT_THRESHOLD = 128
+DEFAULT_MAX_SIZE = 64 << 20
+
+
+class _Dictionary(object):
+    def __init__(self, data, level):
+        self.data = data
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        if data:
+            prefix = compressor.compress(data)
+            prefix += compressor.flush(zlib.Z_SYNC_FLUSH)
+            decompressor.decompress(prefix)
+        self.compressor = compressor
+        self.decompressor = decompressor
+
+    def compress(self, data):
+        compressor = self.compressor.copy()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data, max_length):
+        decompressor = self.decompressor.copy()
+        # one byte more than allowed tells a full frame from a cut one
+        ret = decompressor.decompress(data, max_length + 1)
+        if len(ret) > max_length or decompressor.unconsumed_tail:
+            raise Exception(
+                "decompress error, message larger than %d" % max_length)
+        # raw deflate can't tell whether its stream ended, but a byte fed
+        # after the end comes back as unused data
+        ret += decompressor.decompress('\0')
+        if decompressor.unused_data != '\0':
+            raise Exception("decompress error, stream cut short or followed "
+                            "by other data")
+        return ret
+
+
+class DictionaryRegistry(object):
+    '''
+    Dictionaries by id. Id 0 is the empty dictionary.
+    '''
+    def __init__(self, level=6):
+        self.level = level
+        self._dicts = {0: _Dictionary('', level)}
+
+    def register(self, dict_id, data):
+        if not 0 < dict_id <= 0xffff:
+            raise Exception("Dictionary id out of range: %d" % dict_id)
+        if dict_id in self._dicts:
+            raise Exception("Dictionary id already registered: %d" % dict_id)
+        self._dicts[dict_id] = _Dictionary(data[-MAX_DICT_SIZE:], self.level)
+
+    def get(self, dict_id):
+        try:
+            return self._dicts[dict_id]
+        except KeyError:
+            raise Exception("Unknown dictionary id: %d" % dict_id)
+
+
+def dictionary_from_classes(classes, strings=(), size=MAX_DICT_SIZE):
+    '''
+    Build a dictionary from (class name, field names) pairs and common
+    strings, as the encoder writes them.
+    '''
+    data = []
+    for s in strings:
+        data.append(Encoder().encode_string(s))
+    for _class, fields in classes:
+        obj = HessianObject(_class, dict((field, None) for field in fields))
+        data.append(''.join(Encoder().encode_object_class(obj)[1]))
+    # deflate finds close matches cheaper, so class definitions, which are
+    # in every message, go last
+    return ''.join(data)[-size:]
+
+
+def train_dictionary(samples, size=MAX_DICT_SIZE, segment=16, step=4):
+    '''
+    Learn a dictionary from encoded sample messages: the segments seen in
+    most samples, the most common last.
+    '''
+    counts = defaultdict(int)
+    for sample in samples:
+        seen = set()
+        for i in xrange(0, len(sample) - segment + 1, step):
+            seen.add(sample[i:i+segment])
+        for s in seen:
+            counts[s] += 1
+
+    common = sorted((c, s) for s, c in counts.iteritems() if c > 1)
+    data = []
+    length = 0
+    for c, s in reversed(common):
+        if length + segment > size:
+            break
+        data.append(s)
+        length += segment
+    data.reverse()
+    return ''.join(data)
+
+
+def _crc32(header, body):
+    return zlib.crc32(body, zlib.crc32(header)) & 0xffffffff
+
+
+def _frame(header, body):
+    return header + pack('>L', _crc32(header, body)) + body
+
+
+class CompressedCodec(object):
+    '''
+    Encode values into compressed frames and decode them back.
+
+    Messages shorter than threshold bytes are framed uncompressed, deflate
+    can't make them much smaller. Frames made with any dictionary of the
+    registry can be decoded, whatever dict_id encodes, as long as their
+    message is at most max_size bytes.
+    '''
+    def __init__(self, registry=None, dict_id=0, threshold=DEFAULT_THRESHOLD,
+                 max_size=DEFAULT_MAX_SIZE):
+        self.registry = registry or DictionaryRegistry()
+        self.dict_id = dict_id
+        self.threshold = threshold
+        self.max_size = max_size
+        self.registry.get(dict_id)
+
+    def compress(self, data):
+        if len(data) < self.threshold:
+            return _frame(pack(HEADER, MAGIC, RAW, 0, len(data)), data)
+        body = self.registry.get(self.dict_id).compress(data)
+        return _frame(
+            pack(HEADER, MAGIC, DEFLATE, self.dict_id, len(data)), body)
+
+    def decompress(self, frame):
+        if len(frame) < HEADER_SIZE:
+            raise Exception("decompress error, short frame: %d" % len(frame))
+        magic, flags, dict_id, length, crc = unpack_from(HEADER + 'L', frame)
+        body = frame[HEADER_SIZE:]
+        if _crc32(frame[:CRC_OFFSET], body) != crc:
+            raise Exception("decompress error, crc32 mismatch")
+        if magic != MAGIC:
+            raise Exception("decompress error, unknown magic: %r" % magic)
+        if length > self.max_size:
+            raise Exception(
+                "decompress error, message larger than %d" % self.max_size)
+        if flags == RAW:
+            data = body
+        elif flags == DEFLATE:
+            # never inflates past the length the header announces
+            data = self.registry.get(dict_id).decompress(body, length)
+        else:
+            raise Exception("decompress error, unknown flags: %d" % flags)
+        if len(data) != length:
+            raise Exception("decompress error, message of %d bytes, "
+                            "expected %d" % (len(data), length))
+        return data
+
+    def encode(self, val):
+        return self.compress(dumps(val))
+
+    def decode(self, frame):
+        return loads(self.decompress(frame))
@@ -10,6 +10,7 @@ from struct import unpack
 from datetime import datetime
 MKTIME = datetime.utcfromtimestamp
 from .proto import HessianObjectFactory, TypedMap, DoubleType
+from .stats import instrument
 
 
 ONE_INT_CODE_RANGE = ('\x80', '\xbf')
@@ -28,7 +29,7 @@ SHORT_BINARY_CODE_RANGE = ('\x00', '\x1f')
 
 
 class Decoder(object):
-    def __init__(self):
+    def __init__(self, stats=None):
         self.hessian_obj_factory = HessianObjectFactory()
         self._refs = []
         self._type_refs = []
@@ -60,12 +61,23 @@ class Decoder(object):
             'o': self.decode_object_instance,
             '\x51': self.decode_ref,
         }
+        if stats is not None:
+            instrument(self, stats)
 
     def _set_decoder(self, byte_code, decoder_name):
         if not hasattr(self, decoder_name):
             raise Exception('Unknown decoder name: %s' % decoder_name)
         self.decoders[byte_code] = getattr(self, decoder_name)
 
+    def reset(self):
+        '''
+        Forget refs, type refs and class definitions, so the decoder can be
+        reused for another message.
+        '''
+        self.hessian_obj_factory = HessianObjectFactory()
+        del self._refs[:]
+        del self._type_refs[:]
+
     def decode(self, buf):
         return self._decode(0, buf)[1]
 
@@ -359,7 +371,7 @@ class Decoder(object):
         else:
             raise Exception("decode map error, unknown tag: %r" % tag)
 
-    def decode_ref(self, pos, buf):
+    def read_ref_id(self, pos, buf):
         tag = buf[pos]; pos += 1
         if tag == '\x51':
             pos, ref = self.decode_int(pos, buf)
@@ -369,5 +381,9 @@ class Decoder(object):
             ref = (ord(buf[pos]) << 8) + ord(buf[pos+1]); pos += 2
         else:
             raise Exception("decode ref error, unknown tag: %r" % tag)
+        return pos, ref
+
+    def decode_ref(self, pos, buf):
+        pos, ref = self.read_ref_id(pos, buf)
         return pos, self._refs[ref]
 
@@ -58,6 +58,7 @@ import datetime
 import time
 import types
 from .proto import HessianObject, TypedMap, DoubleType
+from .stats import instrument
 
 
 ONE_OCTET_INT_RANGE = (-0x10, 0x2f)
@@ -71,7 +72,7 @@ FOUR_OCTET_LONG_RANGE = (-0x80000000, 0x7fffffff)
 
 
 class Encoder(object):
-    def __init__(self):
+    def __init__(self, stats=None):
         self._refs = []
         self._classes = []
         self._classes_attrs = {}
@@ -92,6 +93,17 @@ class Encoder(object):
             HessianObject: self.encode_object,
             set: self.encode_set
         }
+        if stats is not None:
+            instrument(self, stats)
+
+    def reset(self):
+        '''
+        Forget refs and class definitions, so the encoder can be reused
+        for another message.
+        '''
+        del self._refs[:]
+        del self._classes[:]
+        self._classes_attrs.clear()
 
     def encode(self, val):
         _type = type(val)
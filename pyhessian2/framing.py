@@ -0,0 +1,188 @@
+#-*- coding:utf8 -*-
+
+'''
+Length-prefixed framing of hessian messages for stream transports.
+
+Every frame is a 4-byte big endian body length followed by the body, which
+is one encoded hessian message. Nothing here does any IO: bytes read from
+a socket are fed to a reader, and the chunks produced by a writer are
+handed to whatever writes to the socket, so the same code serves any event
+loop (tornado, twisted, gevent, ...) as well as blocking sockets.
+'''
+
+from struct import pack, unpack_from
+from .decoder import Decoder
+from .encoder import Encoder
+
+
+HEADER_SIZE = 4
+MAX_FRAME_SIZE = 0xffffffff
+# what a reader buffers for one frame unless told otherwise
+DEFAULT_MAX_FRAME_SIZE = 16 << 20
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class FrameError(Exception):
+    '''
+    Raised by feed when a frame fails. results holds everything the call
+    completed, in order, with the exception of a frame that failed to
+    decode in its place, so no good frame is lost with a bad one.
+    '''
+    def __init__(self, results, error):
+        super(FrameError, self).__init__("frame error: %s" % error)
+        self.results = results
+        self.error = error
+
+
+def pack_frame(data):
+    length = len(data)
+    if length > MAX_FRAME_SIZE:
+        raise Exception("Frame too large: %d" % length)
+    return pack('>L', length) + data
+
+
+def iter_chunks(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Yield data in pieces of at most chunk_size bytes, without copying it.
+    '''
+    view = memoryview(data)
+    for index in xrange(0, len(data), chunk_size):
+        yield view[index:index+chunk_size]
+
+
+class FrameReader(object):
+    '''
+    Incremental frame parser, fed with bytes as they arrive.
+
+    Frames announcing a body larger than max_frame_size are rejected as
+    soon as their header arrives, the stream can't be read past them.
+    '''
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buf = bytearray()
+        # start of the first frame not returned yet
+        self._pos = 0
+
+    def pending(self):
+        '''
+        Number of buffered bytes not yet returned as frames.
+        '''
+        return len(self._buf) - self._pos
+
+    def _next_frame(self):
+        '''
+        Return (body, end) of the first buffered frame, or None when it is
+        not complete yet. The frame stays buffered until _pos moves to end.
+        '''
+        buf = self._buf
+        pos = self._pos
+        if len(buf) - pos < HEADER_SIZE:
+            return None
+        length = unpack_from('>L', buf, pos)[0]
+        if length > self.max_frame_size:
+            raise Exception("Frame too large: %d" % length)
+        end = pos + HEADER_SIZE + length
+        if len(buf) < end:
+            return None
+        return bytes(buf[pos+HEADER_SIZE:end]), end
+
+    def _compact(self):
+        if self._pos:
+            del self._buf[:self._pos]
+            self._pos = 0
+
+    def feed(self, data):
+        '''
+        Buffer data and return the list of frame bodies it completes.
+        '''
+        self._buf.extend(data)
+        frames = []
+        try:
+            while True:
+                head = self._next_frame()
+                if head is None:
+                    break
+                frame, self._pos = head
+                frames.append(frame)
+        except Exception as e:
+            raise FrameError(frames, e)
+        finally:
+            self._compact()
+        return frames
+
+
+class MessageReader(FrameReader):
+    '''
+    Frame parser that decodes every frame as soon as it is complete.
+
+    Decoding a large frame holds up the event loop, so frames of at least
+    offload_size bytes are passed to offload(frame) when it is given, and
+    whatever it returns (typically a future from an executor running
+    MessageReader.decode_frame) takes the place of the decoded value.
+
+    A frame that fails to decode never takes its neighbours with it: every
+    complete frame is decoded, then feed raises a FrameError holding the
+    messages with the exception in place of the bad frame. With
+    return_exceptions true that list is returned instead.
+    '''
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE, offload=None,
+                 offload_size=DEFAULT_CHUNK_SIZE, return_exceptions=False):
+        super(MessageReader, self).__init__(max_frame_size)
+        self.offload = offload
+        self.offload_size = offload_size
+        self.return_exceptions = return_exceptions
+        self._decoder = Decoder()
+
+    @staticmethod
+    def decode_frame(frame):
+        return Decoder().decode(frame)
+
+    def _decode(self, frame):
+        if self.offload is not None and len(frame) >= self.offload_size:
+            return self.offload(frame)
+        self._decoder.reset()
+        return self._decoder.decode(frame)
+
+    def feed(self, data):
+        '''
+        Buffer data and return the list of messages it completes.
+        '''
+        self._buf.extend(data)
+        messages = []
+        error = None
+        try:
+            while True:
+                head = self._next_frame()
+                if head is None:
+                    break
+                frame, self._pos = head
+                try:
+                    messages.append(self._decode(frame))
+                except Exception as e:
+                    messages.append(e)
+                    if error is None:
+                        error = e
+        except Exception as e:
+            raise FrameError(messages, e)
+        finally:
+            self._compact()
+        if error is not None and not self.return_exceptions:
+            raise FrameError(messages, error)
+        return messages
+
+
+class MessageWriter(object):
+    '''
+    Encode messages into frames and split them into chunks, so the caller
+    can wait for the transport to drain between chunks.
+    '''
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._encoder = Encoder()
+
+    def encode(self, val):
+        self._encoder.reset()
+        return pack_frame(self._encoder.encode(val))
+
+    def chunks(self, val):
+        return iter_chunks(self.encode(val), self.chunk_size)
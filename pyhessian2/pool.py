@@ -0,0 +1,87 @@
+#-*- coding:utf8 -*-
+
+'''
+Reuse of Encoder and Decoder instances between messages and threads.
+
+A codec keeps per message state, so it must not be shared by two threads at
+the same time, but building one sets up its whole dispatch table. Pools
+hand out idle codecs instead, reset on checkout; dumps/loads and the
+serial path of encode_many/decode_many use them.
+'''
+
+import threading
+from contextlib import contextmanager
+from .decoder import Decoder
+from .encoder import Encoder
+
+
+class CodecPool(object):
+    '''
+    Thread safe pool of codecs created by factory.
+
+        >>> pool = CodecPool(Encoder)
+        >>> with pool.codec() as encoder:
+        ...     data = encoder.encode(val)
+
+    At most maxsize idle codecs are kept, extra ones are dropped when they
+    are given back.
+    '''
+    def __init__(self, factory, maxsize=16):
+        self.factory = factory
+        self.maxsize = maxsize
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            codec = self._idle.pop() if self._idle else None
+        if codec is None:
+            return self.factory()
+        codec.reset()
+        return codec
+
+    def put(self, codec):
+        # reset now as well, so an idle codec doesn't keep the last
+        # message alive through its refs
+        codec.reset()
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(codec)
+
+    @contextmanager
+    def codec(self):
+        codec = self.get()
+        try:
+            yield codec
+        finally:
+            self.put(codec)
+
+
+class ThreadLocalCodec(threading.local):
+    '''
+    One codec per thread, reset every time it is fetched with get().
+    '''
+    def __init__(self, factory):
+        self.factory = factory
+        self._codec = None
+
+    def get(self):
+        if self._codec is None:
+            self._codec = self.factory()
+        else:
+            self._codec.reset()
+        return self._codec
+
+
+encoder_pool = CodecPool(Encoder)
+decoder_pool = CodecPool(Decoder)
+
+
+def dumps(val):
+    with encoder_pool.codec() as encoder:
+        return encoder.encode(val)
+
+
+def loads(buf):
+    with decoder_pool.codec() as decoder:
+        return decoder.decode(buf)
@@ -0,0 +1,174 @@
+#-*- coding:utf8 -*-
+
+'''
+Append-only log of hessian encoded records with a random access index.
+
+A log is two files:
+    <path>        # the encoded records, one after another
+    <path>.idx    # 8-byte big endian offset and length of every record
+
+Every record is an independent message, encoded with a reset encoder.
+The reader maps both files and decodes a record where it lies in the map,
+so finding record n is one index lookup and nothing is read that isn't
+decoded.
+'''
+
+import mmap
+import os
+from struct import pack, unpack_from
+from .decoder import Decoder
+from .encoder import Encoder
+
+
+INDEX_SUFFIX = '.idx'
+INDEX_ENTRY = '>QQ'
+INDEX_ENTRY_SIZE = 16
+# index entries held back before the writer flushes by itself
+MAX_PENDING = 4096
+
+
+class RecordLogWriter(object):
+    '''
+    Append records to a log, creating it if needed.
+
+    Index entries are only written once the records they point to are
+    flushed, so readers never see an entry for a record not in the data
+    file yet. Records appended since the last flush() aren't visible.
+
+    A log left broken by a crash is repaired on open: the index is cut
+    back to its entries for records wholly in the data file.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._data = open(path, 'ab')
+        self._data.seek(0, os.SEEK_END)
+        self._offset = self._data.tell()
+        with open(path + INDEX_SUFFIX, 'a+b') as f:
+            index = _map(f)
+            try:
+                self._count = _complete(index, self._offset)
+            finally:
+                if isinstance(index, mmap.mmap):
+                    index.close()
+            f.truncate(self._count * INDEX_ENTRY_SIZE)
+        self._index = open(path + INDEX_SUFFIX, 'ab')
+        self._index.seek(0, os.SEEK_END)
+        self._pending = []
+        self._encoder = Encoder()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, val):
+        '''
+        Append val, return its record number.
+        '''
+        self._encoder.reset()
+        data = self._encoder.encode(val)
+        self._data.write(data)
+        self._pending.append(pack(INDEX_ENTRY, self._offset, len(data)))
+        self._offset += len(data)
+        self._count += 1
+        if len(self._pending) >= MAX_PENDING:
+            self.flush()
+        return self._count - 1
+
+    def flush(self):
+        self._data.flush()
+        self._index.write(''.join(self._pending))
+        del self._pending[:]
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _map(f):
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        # an empty file can't be mapped
+        return ''
+    return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+
+
+def _complete(index, size):
+    '''
+    Number of entries at the start of index for records wholly in the
+    first size bytes of the data: after a crash the index may be cut in
+    the middle of an entry, or ahead of the data.
+    '''
+    lo, hi = 0, len(index) // INDEX_ENTRY_SIZE
+    while lo < hi:
+        mid = (lo + hi) // 2
+        offset, length = unpack_from(
+            INDEX_ENTRY, index, mid * INDEX_ENTRY_SIZE)
+        if offset + length <= size:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class RecordLogReader(object):
+    '''
+    Random access to the records of a log, as it was when opened.
+
+        >>> with RecordLogReader(path) as log:
+        ...     last = log[-1]
+        ...     for record in log.iter_range(100, 200):
+        ...         pass
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._data = _map(f)
+        with open(path + INDEX_SUFFIX, 'rb') as f:
+            self._index = _map(f)
+        self._count = _complete(self._index, len(self._data))
+        self._decoder = Decoder()
+
+    def __len__(self):
+        return self._count
+
+    def offset(self, n):
+        if n < 0:
+            n += self._count
+        if not 0 <= n < self._count:
+            raise IndexError('record number out of range: %d' % n)
+        return unpack_from(INDEX_ENTRY, self._index, n * INDEX_ENTRY_SIZE)[0]
+
+    def __getitem__(self, n):
+        self._decoder.reset()
+        return self._decoder._decode(self.offset(n), self._data)[1]
+
+    read = __getitem__
+
+    def iter_range(self, start=0, stop=None):
+        '''
+        Lazily decode the records from start up to, not including, stop.
+        Negative numbers count from the end, as in slices.
+        '''
+        for n in xrange(*slice(start, stop).indices(self._count)):
+            yield self[n]
+
+    def __iter__(self):
+        return self.iter_range()
+
+    def close(self):
+        for m in (self._data, self._index):
+            if isinstance(m, mmap.mmap):
+                m.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
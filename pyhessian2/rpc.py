@@ -0,0 +1,267 @@
+#-*- coding:utf8 -*-
+
+'''
+Hessian2.0 RPC envelopes and an HTTP client.
+
+According to http://hessian.caucho.com/doc/hessian-ws.html.
+
+Envelope grammar:
+    call  ::= 'H' x02 x00 'C' string int value*
+    reply ::= 'H' x02 x00 'R' value
+          ::= 'H' x02 x00 'F' map
+'''
+
+import httplib
+import socket
+import threading
+import Queue
+from urlparse import urlparse
+from .decoder import Decoder
+from .encoder import Encoder
+from .pool import encoder_pool, decoder_pool
+
+
+VERSION = 'H\x02\x00'
+
+
+class Fault(Exception):
+    def __init__(self, code, message, detail=None):
+        super(Fault, self).__init__(code, message)
+        self.code = code
+        self.message = message
+        self.detail = detail
+
+    def __str__(self):
+        return '%s: %s' % (self.code, self.message)
+
+
+def encode_call(method, args, encoder=None):
+    encoder = encoder or Encoder()
+    data = [VERSION, 'C']
+    data.append(encoder.encode_string(method))
+    data.append(encoder.encode_int(len(args)))
+    for arg in args:
+        data.append(encoder.encode(arg))
+    return ''.join(data)
+
+
+def encode_reply(val, encoder=None):
+    encoder = encoder or Encoder()
+    return VERSION + 'R' + encoder.encode(val)
+
+
+def encode_fault(code, message, detail=None, encoder=None):
+    encoder = encoder or Encoder()
+    fault = {'code': code, 'message': message}
+    if detail is not None:
+        fault['detail'] = detail
+    return VERSION + 'F' + encoder.encode(fault)
+
+
+def _skip_version(buf):
+    if buf[:3] == VERSION:
+        return 3
+    return 0
+
+
+def decode_call(buf, decoder=None):
+    '''
+    Return (method, args) of a call envelope.
+    '''
+    decoder = decoder or Decoder()
+    pos = _skip_version(buf)
+    tag = buf[pos]; pos += 1
+    if tag != 'C':
+        raise Exception("decode call error, unknown tag: %r" % tag)
+    pos, method = decoder.decode_string(pos, buf)
+    pos, argc = decoder.decode_int(pos, buf)
+    args = []
+    for i in xrange(argc):
+        pos, arg = decoder._decode(pos, buf)
+        args.append(arg)
+    return method, args
+
+
+def decode_reply(buf, decoder=None):
+    '''
+    Return the value of a reply envelope, or raise Fault for a fault.
+    '''
+    decoder = decoder or Decoder()
+    pos = _skip_version(buf)
+    tag = buf[pos]; pos += 1
+    if tag == 'R':
+        return decoder._decode(pos, buf)[1]
+    elif tag == 'F':
+        fault = decoder._decode(pos, buf)[1]
+        raise Fault(fault.get('code'), fault.get('message'),
+                    fault.get('detail'))
+    else:
+        raise Exception("decode reply error, unknown tag: %r" % tag)
+
+
+class ConnectionPool(object):
+    '''
+    Bounded pool of persistent HTTP/1.1 connections to one host.
+
+    At most maxsize connections are open at a time; get() blocks until one
+    is given back when they are all in use.
+    '''
+    def __init__(self, scheme, host, port, maxsize=8, timeout=None):
+        if scheme == 'https':
+            self.connection_class = httplib.HTTPSConnection
+        else:
+            self.connection_class = httplib.HTTPConnection
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._idle = Queue.LifoQueue(maxsize)
+        self._slots = threading.BoundedSemaphore(maxsize)
+
+    def connect(self):
+        '''
+        A new connection, in the slot of one that was given up.
+        '''
+        return self.connection_class(self.host, self.port,
+                                     timeout=self.timeout)
+
+    def get(self):
+        '''
+        Return (connection, reused).
+        '''
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait(), True
+        except Queue.Empty:
+            pass
+        try:
+            conn = self.connect()
+        except Exception:
+            self._slots.release()
+            raise
+        return conn, False
+
+    def put(self, conn, reuse=True):
+        if reuse:
+            self._idle.put_nowait(conn)
+        else:
+            conn.close()
+        self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Queue.Empty:
+                break
+
+
+def _closed_before_reply(e):
+    # httplib reports an empty status line as "''" or, from 2.7.x on, with
+    # a sentence
+    return e.line in ('', "''") or e.line.startswith('No status line')
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(scheme, host, port, maxsize=8, timeout=None):
+    '''
+    Return the connection pool shared by all clients of a host with the
+    same pool size and timeout.
+    '''
+    key = (scheme, host, port, maxsize, timeout)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                scheme, host, port, maxsize, timeout)
+        return pool
+
+
+class HessianClient(object):
+    '''
+    Thread safe client of a hessian service over HTTP.
+
+        >>> client = HessianClient('http://localhost:8080/api/user')
+        >>> client.call('getUser', 1)
+        >>> client.getUser(1)  # the same
+    '''
+    def __init__(self, url, pool=None, maxsize=8, timeout=None,
+                 headers=None):
+        parsed = urlparse(url)
+        self.path = parsed.path or '/'
+        if parsed.query:
+            self.path += '?' + parsed.query
+        if pool is None:
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+            pool = get_pool(parsed.scheme, parsed.hostname, port, maxsize,
+                            timeout)
+        self.pool = pool
+        self.headers = {'Content-Type': 'application/x-hessian'}
+        if headers:
+            self.headers.update(headers)
+
+    def _exchange(self, conn, body, retry):
+        '''
+        Send body and return (response, data). With retry, return None
+        instead of raising when the connection turned out to be closed
+        before the server could have seen the call: sending failed, or it
+        closed without a byte of reply. Timeouts are never retried, the
+        server may still be running the call.
+        '''
+        try:
+            conn.request('POST', self.path, body, self.headers)
+        except socket.timeout:
+            raise
+        except socket.error:
+            if retry:
+                return None
+            raise
+        try:
+            resp = conn.getresponse()
+        except httplib.BadStatusLine as e:
+            if retry and _closed_before_reply(e):
+                return None
+            raise
+        return resp, resp.read()
+
+    def _post(self, body):
+        conn, reused = self.pool.get()
+        try:
+            result = self._exchange(conn, body, reused)
+            if result is None:
+                # an idle keep-alive connection the server had closed,
+                # try once more on a fresh one
+                conn.close()
+                conn = self.pool.connect()
+                result = self._exchange(conn, body, False)
+        except Exception:
+            self.pool.put(conn, reuse=False)
+            raise
+        resp, data = result
+        self.pool.put(conn, reuse=not resp.will_close)
+        if resp.status != 200:
+            # many servers send their fault envelope with a 500
+            if data:
+                with decoder_pool.codec() as decoder:
+                    try:
+                        decode_reply(data, decoder)
+                    except Fault:
+                        raise
+                    except Exception:
+                        pass
+            raise Exception('HTTP error %d %s' % (resp.status, resp.reason))
+        return data
+
+    def call(self, method, *args):
+        with encoder_pool.codec() as encoder:
+            body = encode_call(method, args, encoder)
+        data = self._post(body)
+        with decoder_pool.codec() as decoder:
+            return decode_reply(data, decoder)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args: self.call(name, *args)
@@ -0,0 +1,273 @@
+#-*- coding:utf8 -*-
+
+'''
+Opt-in profiling of Encoder and Decoder.
+
+instrument() replaces the handlers of one codec instance with wrappers
+that record counts, bytes and time into a CodecStats. Codecs that are not
+instrumented run the plain handlers, so profiling costs nothing until it
+is turned on:
+
+    >>> stats = CodecStats(callback=export)
+    >>> encoder = Encoder(stats=stats)
+    >>> encoder.encode(obj)
+    >>> stats.snapshot()
+
+A CodecStats is not locked, give every thread its own one.
+'''
+
+import time
+from functools import wraps
+
+
+STRING_HANDLERS = ('encode_string', 'decode_string')
+LIST_HANDLERS = ('encode_list', 'encode_set', 'decode_list', 'decode_list_ref')
+
+
+class CodecStats(object):
+    '''
+    Counters collected from instrumented codecs.
+
+    callback, if given, is called with a dict describing every message once
+    it is encoded or decoded.
+    '''
+    def __init__(self, callback=None, timer=time.time):
+        self.callback = callback
+        self.timer = timer
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        # handler name -> [calls, bytes, seconds, self seconds], bytes and
+        # seconds include the nested calls
+        self.handlers = {}
+        # type name -> [count, bytes], bytes exclude the nested values, so
+        # the bytes of all types add up to the bytes of the messages
+        self.types = {}
+        # tag -> count, decoder only
+        self.tags = {}
+        self.ref_hits = 0
+        self.ref_misses = 0
+        self.largest_string = 0
+        self.largest_list = 0
+
+    def snapshot(self):
+        refs = self.ref_hits + self.ref_misses
+        return {
+            'messages': self.messages,
+            'handlers': dict(
+                (name, {'calls': v[0], 'bytes': v[1], 'seconds': v[2],
+                        'self_seconds': v[3]})
+                for name, v in self.handlers.iteritems()),
+            'types': dict(
+                (name, {'count': v[0], 'bytes': v[1]})
+                for name, v in self.types.iteritems()),
+            'tags': dict(self.tags),
+            'ref_hits': self.ref_hits,
+            'ref_misses': self.ref_misses,
+            'ref_hit_rate': float(self.ref_hits) / refs if refs else 0.0,
+            'largest_string': self.largest_string,
+            'largest_list': self.largest_list,
+        }
+
+
+class _Recorder(object):
+    '''
+    Per codec state: the handler call stack and the current message.
+    '''
+    def __init__(self, stats, kind):
+        self.stats = stats
+        self.kind = kind
+        self.stack = []
+        # bytes of the values nested in the values being counted
+        self.nested_bytes = []
+        self.largest_string = 0
+        self.largest_list = 0
+        self.message_begin = None
+
+    def begin_message(self):
+        self.largest_string = 0
+        self.largest_list = 0
+        self.message_begin = self.stats.timer()
+
+    def end_message(self, size):
+        stats = self.stats
+        stats.messages += 1
+        if stats.callback is not None:
+            stats.callback({
+                'kind': self.kind,
+                'bytes': size,
+                'seconds': stats.timer() - self.message_begin,
+                'largest_string': self.largest_string,
+                'largest_list': self.largest_list,
+            })
+
+    def seen_string(self, length):
+        if length > self.largest_string:
+            self.largest_string = length
+            if length > self.stats.largest_string:
+                self.stats.largest_string = length
+
+    def seen_list(self, length):
+        if length > self.largest_list:
+            self.largest_list = length
+            if length > self.stats.largest_list:
+                self.stats.largest_list = length
+
+    def sized(self, val, size):
+        '''
+        Count val, which took size bytes with the values nested in it, as
+        its type. The last item of nested_bytes must be the one pushed for
+        val, the bytes of the values decoded or encoded inside it.
+        '''
+        nested = self.nested_bytes
+        _count_type(self.stats, val, size - nested[-1])
+        if len(nested) > 1:
+            nested[-2] += size
+
+    def timed(self, name, func, args):
+        '''
+        Call func(*args) and add its time, with and without the nested
+        handlers, to the record of name. Return (result, record).
+        '''
+        timer = self.stats.timer
+        stack = self.stack
+        stack.append(0.0)
+        begin = timer()
+        try:
+            ret = func(*args)
+        finally:
+            elapsed = timer() - begin
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            record = self.stats.handlers.get(name)
+            if record is None:
+                record = self.stats.handlers[name] = [0, 0, 0.0, 0.0]
+            record[0] += 1
+            record[2] += elapsed
+            record[3] += elapsed - nested
+        return ret, record
+
+
+def _count_type(stats, val, size):
+    name = type(val).__name__
+    record = stats.types.get(name)
+    if record is None:
+        record = stats.types[name] = [0, 0]
+    record[0] += 1
+    record[1] += size
+
+
+def _encoder_wrapper(recorder, name, func):
+    stats = recorder.stats
+
+    if name == 'encode':
+        @wraps(func)
+        def wrapper(val):
+            top = not recorder.stack
+            if top:
+                recorder.begin_message()
+            recorder.nested_bytes.append(0)
+            try:
+                ret, record = recorder.timed(name, func, (val,))
+                record[1] += len(ret)
+                recorder.sized(val, len(ret))
+            finally:
+                recorder.nested_bytes.pop()
+            if top:
+                recorder.end_message(len(ret))
+            return ret
+    elif name == 'encode_ref':
+        @wraps(func)
+        def wrapper(val):
+            ret, record = recorder.timed(name, func, (val,))
+            if ret:
+                stats.ref_hits += 1
+                record[1] += len(ret)
+            else:
+                stats.ref_misses += 1
+            return ret
+    else:
+        @wraps(func)
+        def wrapper(*args):
+            ret, record = recorder.timed(name, func, args)
+            if isinstance(ret, str):
+                record[1] += len(ret)
+            if name in STRING_HANDLERS:
+                recorder.seen_string(len(args[0]))
+            elif name in LIST_HANDLERS:
+                recorder.seen_list(len(args[0]))
+            return ret
+    return wrapper
+
+
+def _decoder_wrapper(recorder, name, func):
+    stats = recorder.stats
+
+    if name == 'decode':
+        @wraps(func)
+        def wrapper(buf):
+            recorder.begin_message()
+            ret, record = recorder.timed(name, func, (buf,))
+            record[1] += len(buf)
+            recorder.end_message(len(buf))
+            return ret
+    elif name == '_decode':
+        @wraps(func)
+        def wrapper(pos, buf):
+            tag = buf[pos]
+            stats.tags[tag] = stats.tags.get(tag, 0) + 1
+            recorder.nested_bytes.append(0)
+            try:
+                ret, record = recorder.timed(name, func, (pos, buf))
+                record[1] += ret[0] - pos
+                recorder.sized(ret[1], ret[0] - pos)
+            finally:
+                recorder.nested_bytes.pop()
+            return ret
+    else:
+        @wraps(func)
+        def wrapper(pos, buf, *args):
+            ret, record = recorder.timed(name, func, (pos, buf) + args)
+            if ret is None:
+                return ret
+            record[1] += ret[0] - pos
+            if name in STRING_HANDLERS:
+                recorder.seen_string(len(ret[1]))
+            elif name in LIST_HANDLERS:
+                recorder.seen_list(len(ret[1]))
+            return ret
+    return wrapper
+
+
+def _handler_names(codec, prefix):
+    return [name for name in dir(type(codec))
+            if name.startswith(prefix) and callable(getattr(codec, name))]
+
+
+def instrument(codec, stats):
+    '''
+    Record the work of an Encoder or Decoder instance into stats.
+    '''
+    if hasattr(codec, 'encoders'):
+        recorder = _Recorder(stats, 'encode')
+        names, make_wrapper, table = (
+            _handler_names(codec, 'encode'), _encoder_wrapper, 'encoders')
+    else:
+        recorder = _Recorder(stats, 'decode')
+        names, make_wrapper, table = (
+            _handler_names(codec, 'decode') + ['_decode'],
+            _decoder_wrapper, 'decoders')
+
+    for name in names:
+        # wrap the class function, so instrumenting twice doesn't nest
+        func = getattr(type(codec), name).__get__(codec)
+        setattr(codec, name, make_wrapper(recorder, name, func))
+
+    # the dispatch table holds bound methods, point it at the wrappers
+    dispatch = getattr(codec, table)
+    for key, handler in dispatch.items():
+        dispatch[key] = getattr(codec, handler.__name__)
+    codec.stats = stats
+    return codec
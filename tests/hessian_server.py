@@ -0,0 +1,111 @@
+#-*- coding:utf8 -*-
+
+'''
+Local stand-in hessian service for tests and benchmarks.
+
+Public methods of the service object are callable over HTTP/1.1 with
+keep-alive; exceptions raised by them are returned as faults, with HTTP
+status fault_status.
+
+Usage:
+    python tests/hessian_server.py [--port 8080]
+'''
+
+import argparse
+import os
+import socket
+import sys
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyhessian2.rpc import decode_call, encode_reply, encode_fault
+
+
+class EchoService(object):
+    def echo(self, val):
+        return val
+
+    def add(self, a, b):
+        return a + b
+
+    def fail(self, message):
+        raise ValueError(message)
+
+
+class HessianHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, don't wait for delayed acks
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        status = self.server.fault_status
+        try:
+            method, args = decode_call(body)
+        except Exception as e:
+            data = encode_fault('ProtocolException', str(e))
+        else:
+            func = getattr(self.server.service, method, None)
+            if method.startswith('_') or func is None:
+                data = encode_fault('NoSuchMethodException', method)
+            else:
+                try:
+                    data = encode_reply(func(*args))
+                    status = 200
+                except Exception as e:
+                    data = encode_fault('ServiceException', str(e),
+                                        type(e).__name__)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/x-hessian')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HessianServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service=None, fault_status=200):
+        HTTPServer.__init__(self, address, HessianHandler)
+        self.service = service or EchoService()
+        self.fault_status = fault_status
+
+    def handle_error(self, request, client_address):
+        # a client that timed out and hung up is no error of the server
+        if isinstance(sys.exc_info()[1], socket.error):
+            return
+        HTTPServer.handle_error(self, request, client_address)
+
+    @property
+    def url(self):
+        return 'http://%s:%d/' % self.server_address
+
+    def start(self):
+        '''
+        Serve from a daemon thread, return the thread.
+        '''
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    server = HessianServer((args.host, args.port))
+    print('serving on %s' % server.url)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#-*- coding:utf8 -*-
+
+import threading
+import unittest
+from multiprocessing import Pool
+from pyhessian2 import Encoder, HessianObject, decode_many, encode_many
+
+
+BAD = 'Q'  # a ref without its index, fails to decode
+
+
+class Unknown(object):
+    '''
+    A type the encoder has no handler for.
+    '''
+
+
+def message(i):
+    shared = ['item %d' % i]
+    return [HessianObject('a.B%d' % (i % 3), {'x': i, 'y': shared}), shared,
+            HessianObject('a.C', {'z': 'v%d' % i})]
+
+
+def plain(val):
+    if isinstance(val, HessianObject):
+        return (val._class, plain(val.attrs))
+    elif isinstance(val, list):
+        return [plain(v) for v in val]
+    elif isinstance(val, dict):
+        return dict((k, plain(v)) for k, v in val.iteritems())
+    return val
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.vals = [message(i) for i in xrange(20)]
+        self.expected = [Encoder().encode(val) for val in self.vals]
+
+    def test_order(self):
+        self.assertEqual(encode_many(self.vals), self.expected)
+        self.assertEqual(encode_many(self.vals, processes=2, chunksize=3),
+                         self.expected)
+        self.assertEqual(map(plain, decode_many(self.expected)),
+                         map(plain, self.vals))
+        self.assertEqual(
+            map(plain, decode_many(self.expected, processes=2)),
+            map(plain, self.vals))
+
+    def test_return_exceptions(self):
+        for processes in (1, 2):
+            ret = encode_many([1, Unknown(), 2], processes=processes,
+                              return_exceptions=True)
+            self.assertEqual(ret[0], Encoder().encode(1))
+            self.assertTrue(isinstance(ret[1], Exception))
+            self.assertEqual(ret[2], Encoder().encode(2))
+            self.assertRaises(Exception, decode_many, ['\x91', BAD],
+                              processes=processes)
+            ret = decode_many(['\x91', BAD, '\x92'], processes=processes,
+                              return_exceptions=True)
+            self.assertEqual((ret[0], ret[2]), (1, 2))
+            self.assertTrue(isinstance(ret[1], Exception))
+
+    def test_caller_pool(self):
+        pool = Pool(2)
+        try:
+            self.assertEqual(encode_many(self.vals, pool=pool), self.expected)
+            self.assertEqual(encode_many(self.vals, pool=pool), self.expected)
+        finally:
+            pool.close()
+            pool.join()
+
+    def test_concurrent_serial(self):
+        errors = []
+
+        def run():
+            try:
+                for _ in xrange(20):
+                    self.assertEqual(encode_many(self.vals), self.expected)
+                    self.assertEqual(map(plain, decode_many(self.expected)),
+                                     map(plain, self.vals))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in xrange(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
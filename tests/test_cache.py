@@ -0,0 +1,145 @@
+#-*- coding:utf8 -*-
+
+import sys
+import threading
+import unittest
+from pyhessian2 import Decoder, Encoder, HessianObject
+from pyhessian2.cache import CachingDecoder, DecodeCache, SubtreeCache
+
+
+def encode(val):
+    return Encoder().encode(val)
+
+
+def plain(val):
+    '''
+    Comparable form of a decoded value.
+    '''
+    if isinstance(val, HessianObject):
+        return (val._class, plain(val.attrs))
+    elif isinstance(val, list):
+        return [plain(v) for v in val]
+    elif isinstance(val, dict):
+        return dict((k, plain(v)) for k, v in val.iteritems())
+    return val
+
+
+def big_list(n=0):
+    return ['item %d %d' % (n, i) for i in xrange(20)]
+
+
+class DecodeCacheTest(unittest.TestCase):
+    def test_mutation_and_memoryview(self):
+        cache = DecodeCache()
+        buf = encode({'a': [1, 2, 3]})
+        first = cache.decode(buf)
+        first['a'].append(4)
+        self.assertEqual(cache.decode(memoryview(buf)), {'a': [1, 2, 3]})
+        self.assertEqual(cache.decode(bytearray(buf)), {'a': [1, 2, 3]})
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+        self.assertRaises(Exception, cache.decode, [buf])
+
+
+class SubtreeCacheTest(unittest.TestCase):
+    def test_prefixes_follow_entries(self):
+        cache = SubtreeCache(max_entries=8)
+        keys = ['%s%04d' % ('p' * 32, i) for i in xrange(16)]
+
+        def run():
+            for _ in xrange(50):
+                for key in keys:
+                    cache.put(key, key)
+
+        # switch threads as often as possible
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            threads = [threading.Thread(target=run) for _ in xrange(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setcheckinterval(interval)
+        self.assertEqual(sum(cache._prefixes['p' * 32].values()), len(cache))
+        cache.clear()
+        self.assertEqual(cache._prefixes, {})
+
+
+class CachingDecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SubtreeCache()
+        self.decoder = CachingDecoder(self.cache, min_size=32)
+
+    def decode(self, buf):
+        self.decoder.reset()
+        return self.decoder.decode(buf)
+
+    def check(self, val):
+        '''
+        Decode twice, the second time from the cache, and compare with a
+        plain decoder.
+        '''
+        buf = encode(val)
+        expected = plain(Decoder().decode(buf))
+        self.assertEqual(plain(self.decode(buf)), expected)
+        ret = self.decode(buf)
+        self.assertEqual(plain(ret), expected)
+        return ret
+
+    def test_shared_refs(self):
+        l = big_list()
+        ret = self.check(HessianObject('com.xx.Pair', {'x': l, 'y': l}))
+        self.assertTrue(ret.attrs['x'] is ret.attrs['y'])
+        ret = self.check([l, l])
+        self.assertTrue(ret[0] is ret[1])
+        self.assertTrue(self.cache.hits > 0)
+
+    def test_cycle(self):
+        outer = {'big': big_list()}
+        outer['self'] = outer
+        self.check(outer)
+        l = big_list(1)
+        l.append(l)
+        self.check([l])
+
+    def test_class_outside_subtree(self):
+        def message(_class):
+            first = HessianObject(_class, {'a': 0, 'b': 0})
+            rest = [HessianObject(_class, {'a': i, 'b': 'v' * 10})
+                    for i in xrange(5)]
+            return [first, rest]
+        self.check(message('com.xx.A'))
+        hits = self.cache.hits
+        self.check(message('com.xx.A'))
+        self.assertTrue(self.cache.hits > hits)
+        # same bytes for rest, but class 0 is another class now
+        ret = self.check(message('com.xx.B'))
+        self.assertEqual(ret[1][0]._class, 'com.xx.B')
+
+    def test_class_inside_subtree(self):
+        rest = [HessianObject('com.xx.A', {'a': i, 'b': 'v' * 10})
+                for i in xrange(5)]
+        ret = self.check([rest, HessianObject('com.xx.A', {'a': 9, 'b': 0})])
+        self.assertEqual(ret[1]._class, 'com.xx.A')
+        self.assertEqual(ret[1].attrs, {'a': 9, 'b': 0})
+
+    def test_mutation(self):
+        buf = encode([big_list()])
+        ret = self.decode(buf)
+        ret[0].append('changed')
+        self.assertEqual(self.decode(buf), [big_list()])
+        self.decode(buf)[0][0] = 'changed'
+        self.assertEqual(self.decode(buf), [big_list()])
+
+    def test_one_hit_or_miss_per_lookup(self):
+        buf = encode([big_list()])
+        self.decode(buf)
+        # the outer list and the inner list, looked up once each
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.decode(buf)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
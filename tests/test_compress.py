@@ -0,0 +1,66 @@
+#-*- coding:utf8 -*-
+
+import unittest
+from pyhessian2 import dumps
+from pyhessian2.compress import (
+    CompressedCodec, DictionaryRegistry, dictionary_from_classes)
+from pyhessian2.proto import HessianObject
+
+
+class CompressedCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        registry = DictionaryRegistry()
+        registry.register(1, dictionary_from_classes(
+            [('com.xx.person', ['name', 'age'])]))
+        obj = [HessianObject('com.xx.person', {'name': 'x' * 10, 'age': i})
+               for i in xrange(50)]
+        codec = CompressedCodec(registry, dict_id=1)
+        data = dumps(obj)
+        self.assertEqual(codec.decompress(codec.encode(obj)), data)
+        # frames of any registered dictionary can be read
+        self.assertEqual(
+            CompressedCodec(registry).decompress(codec.encode(obj)), data)
+
+    def test_max_size(self):
+        codec = CompressedCodec(threshold=0, max_size=1000)
+        self.assertEqual(codec.decompress(codec.compress('a' * 1000)),
+                         'a' * 1000)
+        # a few hundred bytes of frame that would expand to 10MB
+        bomb = codec.compress('a' * (10 << 20))
+        self.assertTrue(len(bomb) < 20000)
+        self.assertRaises(Exception, codec.decompress, bomb)
+        self.assertRaises(Exception, codec.decompress,
+                          codec.compress('a' * 1001))
+        raw = CompressedCodec(threshold=2000, max_size=1000)
+        self.assertRaises(Exception, raw.decompress, raw.compress('a' * 1001))
+
+    def data(self):
+        return dumps([{'id': i, 'name': 'user %d' % i, 'tags': ['a', 'b']}
+                      for i in xrange(100)])
+
+    def test_truncated(self):
+        data = self.data()
+        for threshold in (0, len(data) + 1):
+            codec = CompressedCodec(threshold=threshold)
+            frame = codec.compress(data)
+            self.assertEqual(codec.decompress(frame), data)
+            for size in (0, 10, 12, len(frame) // 2, len(frame) - 2,
+                         len(frame) - 1):
+                self.assertRaises(Exception, codec.decompress, frame[:size])
+            self.assertRaises(Exception, codec.decompress, frame + 'x')
+
+    def test_corrupted(self):
+        data = self.data()
+        for threshold in (0, len(data) + 1):
+            codec = CompressedCodec(threshold=threshold)
+            frame = bytearray(codec.compress(data))
+            for i in xrange(len(frame)):
+                for bit in (0x01, 0x80):
+                    frame[i] ^= bit
+                    self.assertRaises(Exception, codec.decompress,
+                                      str(frame))
+                    frame[i] ^= bit
+
+
+if __name__ == '__main__':
+    unittest.main()
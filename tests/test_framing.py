@@ -0,0 +1,81 @@
+#-*- coding:utf8 -*-
+
+import unittest
+from pyhessian2 import Encoder
+from pyhessian2.framing import (
+    DEFAULT_MAX_FRAME_SIZE, FrameError, FrameReader, MessageReader,
+    pack_frame)
+
+
+def frame(val):
+    return pack_frame(Encoder().encode(val))
+
+
+BAD = pack_frame('Q')  # a ref without its index, fails to decode
+
+
+class FrameReaderTest(unittest.TestCase):
+    def test_byte_by_byte(self):
+        data = frame([1, 2]) + frame('hello') + frame(None)
+        reader = FrameReader()
+        frames = []
+        for c in data:
+            frames.extend(reader.feed(c))
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(reader.pending(), 0)
+
+    def test_too_large(self):
+        reader = FrameReader(max_frame_size=3)
+        try:
+            reader.feed(frame(1) + frame('hello'))
+        except FrameError as e:
+            self.assertEqual(e.results, [frame(1)[4:]])
+        else:
+            self.fail('no FrameError')
+
+    def test_bounded_default(self):
+        reader = FrameReader()
+        self.assertEqual(reader.max_frame_size, DEFAULT_MAX_FRAME_SIZE)
+        # rejected on the header, nothing of the body is waited for
+        self.assertRaises(FrameError, reader.feed, '\x7f\xff\xff\xff')
+
+
+class MessageReaderTest(unittest.TestCase):
+    def test_messages(self):
+        reader = MessageReader()
+        data = frame({'a': [1, 2]}) + frame('hello')
+        self.assertEqual(reader.feed(data[:5]), [])
+        self.assertEqual(reader.feed(data[5:]), [{'a': [1, 2]}, 'hello'])
+
+    def test_bad_frame_keeps_neighbours(self):
+        reader = MessageReader()
+        data = frame(1) + BAD + frame(2) + frame(3)
+        try:
+            reader.feed(data)
+        except FrameError as e:
+            messages = e.results
+            self.assertTrue(messages[1] is e.error)
+        else:
+            self.fail('no FrameError')
+        self.assertEqual([messages[0]] + messages[2:], [1, 2, 3])
+        self.assertEqual(reader.pending(), 0)
+        self.assertEqual(reader.feed(frame(4)), [4])
+
+    def test_return_exceptions(self):
+        reader = MessageReader(return_exceptions=True)
+        messages = reader.feed(BAD + frame(2) + BAD)
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(isinstance(messages[0], Exception))
+        self.assertEqual(messages[1], 2)
+        self.assertTrue(isinstance(messages[2], Exception))
+        self.assertEqual(reader.feed(frame(3)), [3])
+
+    def test_offload(self):
+        reader = MessageReader(offload=lambda f: ('offloaded', len(f)),
+                               offload_size=5)
+        self.assertEqual(reader.feed(frame('hello') + frame(1)),
+                         [('offloaded', 6), 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#-*- coding:utf8 -*-
+
+import threading
+import unittest
+from pyhessian2 import Decoder, Encoder, HessianObject, dumps, loads
+from pyhessian2.pool import CodecPool, ThreadLocalCodec
+
+
+def message(i):
+    shared = ['item %d' % i]
+    return [HessianObject('a.B%d' % (i % 3), {'x': i, 'y': shared}), shared]
+
+
+class CodecPoolTest(unittest.TestCase):
+    def test_reset_on_checkout(self):
+        pool = CodecPool(Encoder)
+        val = [1, 2]
+        encoder = pool.get()
+        data = encoder.encode(val)
+        # idle with the refs of its last message, as if put() didn't reset
+        pool._idle.append(encoder)
+        with pool.codec() as codec:
+            self.assertTrue(codec is encoder)
+            self.assertEqual(codec.encode(val), data)
+        self.assertEqual(encoder._refs, [])
+
+    def test_maxsize(self):
+        pool = CodecPool(Decoder, maxsize=2)
+        codecs = [pool.get() for _ in xrange(4)]
+        self.assertEqual(len(set(map(id, codecs))), 4)
+        for codec in codecs:
+            pool.put(codec)
+        self.assertEqual(len(pool._idle), 2)
+        self.assertTrue(pool.get() in codecs)
+
+    def test_threads(self):
+        vals = [message(i) for i in xrange(30)]
+        expected = [Encoder().encode(val) for val in vals]
+        errors = []
+
+        def run():
+            try:
+                for _ in xrange(20):
+                    for val, data in zip(vals, expected):
+                        self.assertEqual(dumps(val), data)
+                        ret = loads(data)
+                        self.assertEqual(ret[0].attrs['x'], val[0].attrs['x'])
+                        self.assertTrue(ret[0].attrs['y'] is ret[1])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in xrange(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+
+class ThreadLocalCodecTest(unittest.TestCase):
+    def test_per_thread(self):
+        local = ThreadLocalCodec(Encoder)
+        encoder = local.get()
+        encoder.encode([1])
+        self.assertTrue(local.get() is encoder)
+        self.assertEqual(encoder._refs, [])
+        other = []
+        thread = threading.Thread(target=lambda: other.append(local.get()))
+        thread.start()
+        thread.join()
+        self.assertFalse(other[0] is encoder)
+
+
+if __name__ == '__main__':
+    unittest.main()
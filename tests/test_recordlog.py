@@ -0,0 +1,86 @@
+#-*- coding:utf8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from pyhessian2.recordlog import (
+    INDEX_ENTRY_SIZE, INDEX_SUFFIX, MAX_PENDING, RecordLogReader,
+    RecordLogWriter)
+
+
+class RecordLogTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'log')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_unflushed_writer(self):
+        writer = RecordLogWriter(self.path)
+        for i in xrange(MAX_PENDING + 500):
+            writer.append(i)
+        # every indexed record is in the data file, whatever is buffered
+        with RecordLogReader(self.path) as log:
+            self.assertTrue(len(log) <= MAX_PENDING + 500)
+            self.assertEqual(list(log), range(len(log)))
+        writer.close()
+        with RecordLogReader(self.path) as log:
+            self.assertEqual(len(log), MAX_PENDING + 500)
+            self.assertEqual(log[-1], MAX_PENDING + 499)
+
+    def append(self, vals):
+        with RecordLogWriter(self.path) as writer:
+            for val in vals:
+                writer.append(val)
+
+    def truncate(self, path, size):
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+    def test_index_ahead_of_data(self):
+        self.append([i * 1000 for i in xrange(10)])
+        self.truncate(self.path, 0)
+        with RecordLogReader(self.path) as log:
+            self.assertEqual(len(log), 0)
+        self.assertEqual(os.path.getsize(self.path + INDEX_SUFFIX),
+                         10 * INDEX_ENTRY_SIZE)
+
+    def test_torn_record(self):
+        vals = ['record %d' % i for i in xrange(10)]
+        self.append(vals)
+        self.truncate(self.path, os.path.getsize(self.path) - 5)
+        with RecordLogReader(self.path) as log:
+            self.assertEqual(len(log), 9)
+            self.assertEqual(list(log), vals[:9])
+        # the writer drops the entry of the torn record
+        self.append(['new'])
+        with RecordLogReader(self.path) as log:
+            self.assertEqual(list(log), vals[:9] + ['new'])
+
+    def test_torn_index_entry(self):
+        vals = ['record %d' % i for i in xrange(3)]
+        self.append(vals)
+        self.truncate(self.path + INDEX_SUFFIX, INDEX_ENTRY_SIZE + 5)
+        with RecordLogReader(self.path) as log:
+            self.assertEqual(list(log), vals[:1])
+        self.append(['new'])
+        self.assertEqual(os.path.getsize(self.path + INDEX_SUFFIX),
+                         2 * INDEX_ENTRY_SIZE)
+        with RecordLogReader(self.path) as log:
+            self.assertEqual(list(log), vals[:1] + ['new'])
+
+    def test_negative_range(self):
+        with RecordLogWriter(self.path) as writer:
+            for i in xrange(5):
+                writer.append(i)
+        with RecordLogReader(self.path) as log:
+            self.assertEqual(list(log.iter_range(-2)), [3, 4])
+            self.assertEqual(list(log.iter_range(-2, 3)), [])
+            self.assertEqual(list(log.iter_range(1, -1)), [1, 2, 3])
+            self.assertEqual(list(log.iter_range(-10, 100)), range(5))
+
+
+if __name__ == '__main__':
+    unittest.main()
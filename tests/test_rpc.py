@@ -0,0 +1,123 @@
+#-*- coding:utf8 -*-
+
+import socket
+import threading
+import unittest
+from pyhessian2 import HessianObject
+from pyhessian2.rpc import (
+    ConnectionPool, Fault, HessianClient, decode_call, decode_reply,
+    encode_call, encode_fault, encode_reply, get_pool)
+from .hessian_server import EchoService, HessianServer
+
+
+class SlowService(EchoService):
+    def __init__(self):
+        self.sleeps = 0
+        self.release = threading.Event()
+        self.done = threading.Event()
+
+    def sleep(self, seconds):
+        '''
+        Sleep until released or seconds have passed.
+        '''
+        self.sleeps += 1
+        self.release.wait(seconds)
+        self.done.set()
+        return seconds
+
+
+class EnvelopeTest(unittest.TestCase):
+    def test_call(self):
+        self.assertEqual(decode_call(encode_call('add', [1, 'a'])),
+                         ('add', [1, 'a']))
+
+    def test_reply(self):
+        self.assertEqual(decode_reply(encode_reply({'a': [1]})), {'a': [1]})
+
+    def test_fault(self):
+        try:
+            decode_reply(encode_fault('ServiceException', 'boom', 'detail'))
+        except Fault as e:
+            self.assertEqual((e.code, e.message, e.detail),
+                             ('ServiceException', 'boom', 'detail'))
+        else:
+            self.fail('no fault raised')
+
+
+class ClientTest(unittest.TestCase):
+    fault_status = 200
+
+    def setUp(self):
+        self.service = SlowService()
+        self.server = HessianServer(('127.0.0.1', 0), self.service,
+                                    self.fault_status)
+        self.server.start()
+        host, port = self.server.server_address
+        self.pool = ConnectionPool('http', host, port, maxsize=1,
+                                   timeout=0.2)
+        self.client = HessianClient(self.server.url, pool=self.pool)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def idle_socket(self):
+        return self.pool._idle.queue[0].sock
+
+    def test_call_reply(self):
+        self.assertEqual(self.client.add(1, 2), 3)
+        obj = HessianObject('com.example.Order', {'id': 1, 'user': 'x'})
+        ret = self.client.call('echo', obj)
+        self.assertEqual((ret._class, ret.attrs), (obj._class, obj.attrs))
+
+    def test_fault(self):
+        try:
+            self.client.fail('boom')
+        except Fault as e:
+            self.assertEqual(e.code, 'ServiceException')
+            self.assertEqual(e.message, 'boom')
+            self.assertEqual(e.detail, 'ValueError')
+        else:
+            self.fail('no fault raised')
+        self.assertRaises(Fault, self.client.no_such_method)
+
+    def test_keep_alive(self):
+        self.client.add(1, 2)
+        sock = self.idle_socket()
+        self.client.add(3, 4)
+        self.assertTrue(self.idle_socket() is sock)
+
+    def test_retry_closed_connection(self):
+        self.client.add(1, 2)
+        self.idle_socket().shutdown(socket.SHUT_RDWR)
+        self.assertEqual(self.client.add(3, 4), 7)
+
+    def test_no_retry_on_timeout(self):
+        self.client.add(1, 2)  # the next call runs on a reused connection
+        self.assertRaises(socket.timeout, self.client.sleep, 10)
+        self.service.release.set()
+        self.service.done.wait(10)
+        self.assertEqual(self.service.sleeps, 1)
+
+
+class FaultStatusTest(ClientTest):
+    '''
+    The same against a server sending faults with a 500.
+    '''
+    fault_status = 500
+
+
+class GetPoolTest(unittest.TestCase):
+    def test_key(self):
+        pool = get_pool('http', 'example.com', 80, 4, None)
+        self.assertTrue(get_pool('http', 'example.com', 80, 4, None) is pool)
+        other = get_pool('http', 'example.com', 80, 4, 5)
+        self.assertFalse(other is pool)
+        self.assertEqual(other.timeout, 5)
+        client = HessianClient('http://example.com/api', timeout=5, maxsize=4)
+        self.assertTrue(client.pool is other)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#-*- coding:utf8 -*-
+
+import unittest
+from pyhessian2 import Decoder, Encoder
+from pyhessian2.stats import CodecStats
+
+
+class CodecStatsTest(unittest.TestCase):
+    def test_messages(self):
+        messages = []
+        stats = CodecStats(callback=messages.append)
+        encoder = Encoder(stats=stats)
+        data = encoder.encode({'a': [1, 2]})
+        Decoder(stats=stats).decode(data)
+        self.assertEqual(stats.messages, 2)
+        self.assertEqual([m['kind'] for m in messages], ['encode', 'decode'])
+        self.assertEqual([m['bytes'] for m in messages],
+                         [len(data), len(data)])
+        self.assertEqual(stats.largest_list, 2)
+
+    def test_types_and_refs(self):
+        shared = [1]
+        val = [shared, 'ab', shared, {'k': 300}]
+        stats = CodecStats()
+        data = Encoder(stats=stats).encode(val)
+        snapshot = stats.snapshot()
+        # the outer list, shared and the map are new, shared again a ref
+        self.assertEqual((stats.ref_hits, stats.ref_misses), (1, 3))
+        types = snapshot['types']
+        self.assertEqual(types['list']['count'], 3)
+        self.assertEqual(types['int']['count'], 2)
+        self.assertEqual(types['str']['count'], 2)
+        # nested values aren't counted again in their containers
+        self.assertEqual(sum(t['bytes'] for t in types.values()), len(data))
+        self.assertEqual(types['int']['bytes'], 3)
+
+        stats = CodecStats()
+        Decoder(stats=stats).decode(data)
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['tags']['V'], 2)
+        self.assertEqual(snapshot['tags']['H'], 1)
+        self.assertEqual(sum(snapshot['tags'].values()), 8)
+        self.assertEqual(snapshot['types']['dict'], {'count': 1, 'bytes': 2})
+        self.assertEqual(
+            sum(t['bytes'] for t in snapshot['types'].values()), len(data))
+
+    def test_uninstrumented(self):
+        encoder = Encoder()
+        decoder = Decoder()
+        self.assertFalse('encode' in vars(encoder))
+        self.assertFalse('_decode' in vars(decoder))
+        self.assertTrue(encoder.encode.__func__ is Encoder.encode.__func__)
+        self.assertTrue(
+            encoder.encoders[list].__func__ is Encoder.encode_list.__func__)
+        self.assertTrue(
+            decoder.decoders['V'].__func__ is Decoder.decode_list.__func__)
+        self.assertFalse(hasattr(encoder, 'stats'))
+
+
+if __name__ == '__main__':
+    unittest.main()